@@ -0,0 +1,539 @@
+"""Multi-account load simulation for the CF-EMC Energy integration.
+
+Stands up a local fake portal and a Home Assistant instance recording to a
+throwaway SQLite database, then drives one EMCDataCoordinator per simulated account through a
+concurrent backfill followed by a daily update. For each phase it reports
+event loop blocking, executor queue depth, recorder write throughput and,
+with --memory, memory per entry from a separate tracemalloc pass.
+
+Tested against Home Assistant 2025.1.4 on Python 3.12. It reads recorder and
+executor internals, so other versions may need adjusting. Install it with the
+recorder and integration requirements, then run from the repository root:
+
+    pip install homeassistant==2025.1.4 SQLAlchemy==2.0.36 fnv-hash-fast==1.0.2 \
+        psutil-home-assistant==0.0.1 requests beautifulsoup4
+
+    python scripts/load_simulation.py --entries 50 --backfill-days 30
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gc
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from homeassistant import bootstrap, loader
+from homeassistant.components.recorder import get_instance, statistics as recorder_statistics
+from homeassistant.components.recorder.tasks import SynchronizeTask
+from homeassistant.config_entries import ConfigEntries
+from homeassistant.const import __version__ as HA_VERSION
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import recorder as recorder_helper
+from homeassistant.runner import MAX_EXECUTOR_WORKERS
+from homeassistant.setup import async_setup_component
+from homeassistant.util import dt as dt_util
+
+from custom_components.cfemc_energy.api import CFEMCApi
+from custom_components.cfemc_energy.coordinator import EMCDataCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+TESTED_HA_VERSION = "2025.1.4"
+
+USERNAME_FIELD = "dnn$ctr384$CustomerLogin$txtUsername"
+
+LOGIN_PAGE = """<html><body><form>
+<input name="__VIEWSTATE" value="sim" />
+<input name="__EVENTVALIDATION" value="sim" />
+<input name="__RequestVerificationToken" value="sim" />
+</form></body></html>"""
+
+
+class PortalServer(ThreadingHTTPServer):
+    """HTTP server with a listen backlog deep enough for many clients."""
+
+    daemon_threads = True
+    # The default backlog of 5 resets connections once a few dozen accounts
+    # fetch at once, which would show up as integration fetch errors.
+    request_queue_size = 1024
+
+
+class FakePortal:
+    """A threaded local HTTP server that mimics the utility's online portal."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.publish_yesterday = False
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._server = PortalServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def point_api(self, api: CFEMCApi) -> None:
+        """Redirect an API client's endpoints at this portal."""
+        api.login_url = f"{self.base_url}/login"
+        api.usage_url = f"{self.base_url}/usage"
+        api.daily_url = f"{self.base_url}/daily"
+        api.hourly_url = f"{self.base_url}/hourly"
+
+    def hourly_items(self, payload: dict) -> list:
+        """Build deterministic hourly readings for the requested date range."""
+        account = payload["MemberSep"]
+        start = datetime.strptime(payload["StartDate"], "%m/%d/%Y").date()
+        end = datetime.strptime(payload["EndDate"], "%m/%d/%Y").date()
+        yesterday = dt_util.now().date() - timedelta(days=1)
+
+        items = []
+        day = start
+        while day <= end:
+            if day < yesterday or (day == yesterday and self.publish_yesterday):
+                rng = random.Random(f"{account}-{day.isoformat()}")
+                for hour in range(24):
+                    timestamp = datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)
+                    items.append({
+                        "UsageHourDate": timestamp.strftime("%m/%d/%Y %I:%M %p"),
+                        "KWH": f"{rng.uniform(0.2, 3.0):.3f}",
+                    })
+            day += timedelta(days=1)
+        return items
+
+    def _handler(self):
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, body: str, content_type: str = "text/html") -> None:
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _begin(self) -> str:
+                with portal._lock:
+                    portal.request_count += 1
+                if portal.latency:
+                    time.sleep(portal.latency)
+                length = int(self.headers.get("Content-Length", 0))
+                return self.rfile.read(length).decode() if length else ""
+
+            def do_GET(self):
+                self._begin()
+                self._reply(LOGIN_PAGE if self.path == "/login" else "<html></html>")
+
+            def do_POST(self):
+                body = self._begin()
+                if self.path == "/login":
+                    username = parse_qs(body).get(USERNAME_FIELD, [""])[0]
+                    self._reply(f"Welcome {username}")
+                elif self.path == "/hourly":
+                    # The client posts str(dict), not JSON.
+                    items = portal.hourly_items(ast.literal_eval(body))
+                    self._reply(json.dumps({"d": {"Items": items}}), "application/json")
+                else:
+                    self._reply(json.dumps({"d": {}}), "application/json")
+
+        return Handler
+
+
+class InstrumentedCoordinator(EMCDataCoordinator):
+    """Coordinator that counts portal fetches and failures where they happen.
+
+    EMCDataCoordinator logs and swallows per-day errors, so a refresh reports
+    success even when every fetch failed. The counters here see each call.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.reset_counters()
+
+        get_hourly_data = self.api.get_hourly_data
+
+        def counted_get_hourly_data(start_date, end_date):
+            # The coordinator requests one missing day per call.
+            self.days_requested += 1
+            try:
+                hourly_data = get_hourly_data(start_date, end_date)
+            except Exception:
+                self.fetch_errors += 1
+                raise
+            if hourly_data:
+                self.days_fetched += 1
+            return hourly_data
+
+        self.api.get_hourly_data = counted_get_hourly_data
+
+    def reset_counters(self) -> None:
+        self.days_requested = 0
+        self.days_fetched = 0
+        self.fetch_errors = 0
+        self.insert_errors = 0
+        self.rows_submitted = 0
+
+    async def _insert_statistics(self, hourly_data: list):
+        self.rows_submitted += len(hourly_data)
+        try:
+            await super()._insert_statistics(hourly_data)
+        except Exception:
+            self.insert_errors += 1
+            raise
+
+
+class RecorderProbe:
+    """Time statistics imports as the recorder thread runs them.
+
+    import_statistics runs in its own session scope, so a finished call means
+    its rows are committed.
+    """
+
+    def __init__(self) -> None:
+        self._original = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.import_time = 0.0
+        self.imports = 0
+        self.rows_committed = 0
+
+    def install(self) -> None:
+        original = self._original = recorder_statistics.import_statistics
+
+        def timed_import_statistics(instance, metadata, statistics, table):
+            started = time.perf_counter()
+            finished = original(instance, metadata, statistics, table)
+            self.import_time += time.perf_counter() - started
+            if finished:
+                self.imports += 1
+                self.rows_committed += len(statistics)
+            return finished
+
+        recorder_statistics.import_statistics = timed_import_statistics
+
+    def uninstall(self) -> None:
+        recorder_statistics.import_statistics = self._original
+
+
+@dataclass
+class PhaseStats:
+    """Measurements collected while a phase runs."""
+
+    name: str
+    expected_requests: int
+    expected_days: int
+    wall_time: float = 0.0
+    drain_time: float = 0.0
+    blocked_time: float = 0.0
+    max_block: float = 0.0
+    samples: int = 0
+    max_executor_queue: int = 0
+    max_db_executor_queue: int = 0
+    max_recorder_backlog: int = 0
+    rows_submitted: int = 0
+    rows_committed: int = 0
+    imports: int = 0
+    import_time: float = 0.0
+    days_requested: tuple[int, int] = (0, 0)
+    days_fetched: tuple[int, int] = (0, 0)
+    fetch_errors: int = 0
+    insert_errors: int = 0
+    memory_per_entry: float | None = None
+    executor_queue_total: int = field(default=0, repr=False)
+
+
+class LoopMonitor:
+    """Sample event loop lag and queue depths at a fixed interval."""
+
+    def __init__(self, hass: HomeAssistant, executor: ThreadPoolExecutor, interval: float, threshold: float) -> None:
+        self.hass = hass
+        self.executor = executor
+        self.interval = interval
+        self.threshold = threshold
+        self.stats: PhaseStats | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self, stats: PhaseStats) -> None:
+        self.stats = stats
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        recorder = get_instance(self.hass)
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - started - self.interval
+            stats = self.stats
+            if lag > self.threshold:
+                stats.blocked_time += lag
+                stats.max_block = max(stats.max_block, lag)
+
+            depth = self.executor._work_queue.qsize()
+            stats.samples += 1
+            stats.executor_queue_total += depth
+            stats.max_executor_queue = max(stats.max_executor_queue, depth)
+            if (db_executor := recorder._db_executor) is not None:
+                stats.max_db_executor_queue = max(stats.max_db_executor_queue, db_executor._work_queue.qsize())
+            stats.max_recorder_backlog = max(stats.max_recorder_backlog, recorder.backlog)
+
+
+def traced_memory() -> int:
+    """Return traced memory after collecting garbage."""
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    return current
+
+
+async def drain_recorder(hass: HomeAssistant) -> None:
+    """Wait until the recorder thread has run every task queued so far."""
+    # Recorder.async_block_till_done returns as soon as the queue is empty,
+    # while the last import may still be running on the recorder thread.
+    event = asyncio.Event()
+    get_instance(hass).queue_task(SynchronizeTask(event))
+    await event.wait()
+
+
+async def run_phase(
+    stats: PhaseStats,
+    hass: HomeAssistant,
+    coordinators: list[InstrumentedCoordinator],
+    monitor: LoopMonitor,
+    probe: RecorderProbe,
+    concurrency: int,
+) -> PhaseStats:
+    """Refresh every coordinator concurrently and wait for the recorder to drain."""
+    semaphore = asyncio.Semaphore(concurrency)
+    for coordinator in coordinators:
+        coordinator.reset_counters()
+    probe.reset()
+    memory_before = traced_memory() if tracemalloc.is_tracing() else None
+
+    async def refresh(coordinator: InstrumentedCoordinator) -> None:
+        async with semaphore:
+            await coordinator.async_refresh()
+
+    monitor.start(stats)
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(refresh(c) for c in coordinators))
+        refreshed = time.perf_counter()
+        await drain_recorder(hass)
+        finished = time.perf_counter()
+    finally:
+        await monitor.stop()
+
+    stats.wall_time = finished - started
+    stats.drain_time = finished - refreshed
+    stats.rows_submitted = sum(c.rows_submitted for c in coordinators)
+    stats.rows_committed = probe.rows_committed
+    stats.imports = probe.imports
+    stats.import_time = probe.import_time
+    requested = [c.days_requested for c in coordinators]
+    fetched = [c.days_fetched for c in coordinators]
+    stats.days_requested = (min(requested), max(requested))
+    stats.days_fetched = (min(fetched), max(fetched))
+    stats.fetch_errors = sum(c.fetch_errors for c in coordinators)
+    stats.insert_errors = sum(c.insert_errors for c in coordinators)
+    if memory_before is not None:
+        stats.memory_per_entry = (traced_memory() - memory_before) / len(coordinators)
+    return stats
+
+
+async def simulate(args: argparse.Namespace, trace_memory: bool) -> tuple[list[PhaseStats], float | None, int]:
+    """Run the backfill and daily update phases against a fresh instance.
+
+    Returns the phase stats, the memory cost per entry right after the
+    coordinators are built (when tracing memory) and the portal request count.
+    """
+    executor = ThreadPoolExecutor(max_workers=args.executor_workers, thread_name_prefix="SyncWorker")
+    asyncio.get_running_loop().set_default_executor(executor)
+
+    portal = FakePortal(args.portal_latency / 1000)
+    portal.start()
+    probe = RecorderProbe()
+    probe.install()
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        loader.async_setup(hass)
+        hass.config_entries = ConfigEntries(hass, {})
+        hass.config.skip_pip = True
+        await hass.config.async_set_time_zone(args.time_zone)
+        await bootstrap.async_load_base_functionality(hass)
+        recorder_helper.async_initialize_recorder(hass)
+        assert await async_setup_component(
+            hass,
+            "recorder",
+            {
+                "recorder": {
+                    # The recorder rejects in-memory SQLite outside its own tests.
+                    "db_url": f"sqlite:///{os.path.join(config_dir, 'home-assistant_v2.db')}",
+                    "commit_interval": args.commit_interval,
+                }
+            },
+        )
+        await hass.async_start()
+        await get_instance(hass).async_db_ready
+
+        initial_per_entry = None
+        if trace_memory:
+            tracemalloc.start()
+            memory_before = traced_memory()
+
+        coordinators = []
+        for index in range(args.entries):
+            # Mirrors async_setup_entry, without a stored config entry.
+            api = CFEMCApi(
+                username=f"sim{index}",
+                password="sim",
+                member_number=100000 + index,
+                account_number=index + 1,
+            )
+            portal.point_api(api)
+            coordinators.append(InstrumentedCoordinator(hass, api=api, backfill_days=args.backfill_days))
+
+        if trace_memory:
+            initial_per_entry = (traced_memory() - memory_before) / args.entries
+
+        monitor = LoopMonitor(hass, executor, args.sample_interval / 1000, args.block_threshold / 1000)
+        phases = []
+        try:
+            # Yesterday is withheld during backfill, as the utility often
+            # publishes it late, so the daily update has one new day to fetch.
+            backfill = PhaseStats("backfill", args.backfill_days, args.backfill_days - 1)
+            phases.append(await run_phase(backfill, hass, coordinators, monitor, probe, args.concurrency))
+            portal.publish_yesterday = True
+            daily = PhaseStats("daily update", 1, 1)
+            phases.append(await run_phase(daily, hass, coordinators, monitor, probe, args.concurrency))
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+            await hass.async_stop()
+            probe.uninstall()
+            portal.stop()
+
+    return phases, initial_per_entry, portal.request_count
+
+
+def print_report(
+    args: argparse.Namespace,
+    phases: list[PhaseStats],
+    initial_per_entry: float | None,
+    request_count: int,
+) -> None:
+    print(
+        f"\nHome Assistant {HA_VERSION}, {args.entries} entries, {args.backfill_days} backfill days, "
+        f"concurrency {args.concurrency}, {args.executor_workers} executor workers, "
+        f"{request_count} portal requests"
+    )
+    if initial_per_entry is not None:
+        print(f"memory per entry after setup {initial_per_entry / 1024:.1f} KiB (separate tracemalloc pass)")
+    for stats in phases:
+        mean_depth = stats.executor_queue_total / stats.samples if stats.samples else 0.0
+        throughput = stats.rows_committed / stats.import_time if stats.import_time else 0.0
+        print(f"\n[{stats.name}]")
+        print(f"  wall time                {stats.wall_time:10.2f} s (recorder drain {stats.drain_time:.2f} s)")
+        print(f"  event loop blocked       {stats.blocked_time * 1000:10.1f} ms total, {stats.max_block * 1000:.1f} ms worst")
+        print(f"  executor queue depth     {stats.max_executor_queue:10d} max, {mean_depth:.1f} mean")
+        print(f"  recorder db queue depth  {stats.max_db_executor_queue:10d} max")
+        print(f"  recorder backlog         {stats.max_recorder_backlog:10d} max")
+        print(f"  rows submitted           {stats.rows_submitted:10d}")
+        print(
+            f"  rows committed           {stats.rows_committed:10d} in {stats.imports} imports, "
+            f"{stats.import_time:.2f} s recorder time ({throughput:.0f} rows/s)"
+        )
+        print(f"  days requested per entry {stats.days_requested[0]:5d}-{stats.days_requested[1]:<4d} (expected {stats.expected_requests})")
+        print(f"  days fetched per entry   {stats.days_fetched[0]:5d}-{stats.days_fetched[1]:<4d} (expected {stats.expected_days})")
+        print(f"  fetch errors             {stats.fetch_errors:10d}")
+        print(f"  insert errors            {stats.insert_errors:10d}")
+        if stats.memory_per_entry is not None:
+            print(f"  memory growth per entry  {stats.memory_per_entry / 1024:10.1f} KiB (separate tracemalloc pass)")
+
+
+async def async_main(args: argparse.Namespace) -> None:
+    if HA_VERSION != TESTED_HA_VERSION:
+        _LOGGER.warning(
+            "Running against Home Assistant %s; this harness is tested with %s "
+            "and reads recorder internals that may have changed",
+            HA_VERSION,
+            TESTED_HA_VERSION,
+        )
+
+    phases, _, request_count = await simulate(args, trace_memory=False)
+    initial_per_entry = None
+    if args.memory:
+        # tracemalloc hooks every allocation in every thread, so memory is
+        # measured in its own pass and never skews the timing figures.
+        memory_phases, initial_per_entry, _ = await simulate(args, trace_memory=True)
+        for stats, memory_stats in zip(phases, memory_phases):
+            stats.memory_per_entry = memory_stats.memory_per_entry
+
+    print_report(args, phases, initial_per_entry, request_count)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10, help="number of simulated accounts")
+    parser.add_argument("--backfill-days", type=int, default=7, help="days of history each account backfills")
+    parser.add_argument("--concurrency", type=int, default=0, help="max refreshes in flight (0 for all entries)")
+    parser.add_argument("--executor-workers", type=int, default=MAX_EXECUTOR_WORKERS, help="size of the default executor")
+    parser.add_argument("--portal-latency", type=float, default=20.0, help="fake portal latency per request in ms")
+    parser.add_argument("--commit-interval", type=int, default=5, help="recorder commit interval in seconds")
+    parser.add_argument("--sample-interval", type=float, default=10.0, help="event loop sampling interval in ms")
+    parser.add_argument("--block-threshold", type=float, default=5.0, help="loop lag in ms counted as blocking")
+    parser.add_argument("--time-zone", default="America/New_York")
+    parser.add_argument("--memory", action="store_true", help="add a separate tracemalloc pass for memory per entry")
+    parser.add_argument("--verbose", action="store_true", help="show integration logging")
+    args = parser.parse_args()
+    if args.concurrency <= 0:
+        args.concurrency = args.entries
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    # Importing the integration from the repository root trips the loader's
+    # untested custom integration warning.
+    logging.getLogger("homeassistant.loader").setLevel(logging.ERROR)
+    if not args.verbose:
+        # Silence the expected "no data returned" warnings for withheld days.
+        logging.getLogger("custom_components.cfemc_energy").setLevel(logging.ERROR)
+    asyncio.run(async_main(args))
+
+
+if __name__ == "__main__":
+    main()